@@ -1,4 +1,5 @@
 import asyncio
+import functools
 from camera import Camera
 from aiohttp import ClientSession
 from blinkpy.blinkpy import Blink
@@ -15,7 +16,15 @@ async def start():
     await blink.start()
     return blink
 
-blink = asyncio.run(start())
+@functools.cache
+def get_blink():
+    """Authenticate with Blink on first use and reuse the session
+
+    Logging in at import time blocked every importer for the length of
+    a Blink login round-trip (and broke under an already-running event
+    loop); the cache gives all callers the one authenticated session.
+    """
+    return asyncio.run(start())
 
 def get_cameras(blink:Blink):
     names, cameras = [], []
@@ -27,8 +36,8 @@ def get_cameras(blink:Blink):
 class BlinkCamera(Camera):
 
     def _start_camera(self):
-        return blink.get_live_stream()
+        return get_blink().get_live_stream()
 
     def get_rtsp_url(self, *args, **kwargs):
         super().get_rtsp_url(*args, **kwargs)
-        return blink.
\ No newline at end of file
+        return self._start_camera()
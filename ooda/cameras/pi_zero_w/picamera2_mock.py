@@ -1,35 +1,73 @@
 """
 Mock picamera2 module for local testing
 """
+import sys
+import time
+import types
+
 class Picamera2:
     def __init__(self):
         print("Mock Picamera2 initialized")
-        
+        self._encoder = None
+
     def configure(self, config):
         print("Mock camera configured")
-        
+
     def create_video_configuration(self):
         return {}
-        
+
     def start(self):
         print("Mock camera started")
-        
+
     def stop(self):
         print("Mock camera stopped")
-        
-    def create_encoder(self):
-        encoder = MockEncoder()
-        return encoder
 
-class MockEncoder:
-    def __init__(self):
-        self.output = None
-        
-    def start(self):
-        print(f"Mock encoder started: {self.output}")
-        # Create a dummy file
-        with open(self.output, 'wb') as f:
-            f.write(b'dummy video content')
-            
-    def stop(self):
-        print("Mock encoder stopped")
+    def start_recording(self, encoder, output):
+        self._encoder = encoder
+        self._encoder.output = output
+        print(f"Mock recording started: {output.file}")
+
+    def wait_recording(self, duration):
+        time.sleep(duration)
+
+    def stop_recording(self):
+        print("Mock recording stopped")
+        self._encoder = None
+
+class H264Encoder:
+    def __init__(self, bitrate=None, repeat=False, iperiod=None):
+        self.bitrate = bitrate
+        self.repeat = repeat
+        self.iperiod = iperiod
+        self._output = None
+
+    @property
+    def output(self):
+        return self._output
+
+    @output.setter
+    def output(self, value):
+        # Swapping the output rolls over to a new file, as the real
+        # encoder does while it keeps running
+        self._output = value
+        if value is not None:
+            if hasattr(value.file, 'write'):
+                value.file.write(b'dummy video content')
+                value.file.close()
+            else:
+                with open(value.file, 'wb') as f:
+                    f.write(b'dummy video content')
+
+class FileOutput:
+    def __init__(self, file):
+        self.file = file
+
+# Register submodules so `from picamera2.encoders import H264Encoder`
+# resolves when this module is installed as sys.modules['picamera2']
+_encoders = types.ModuleType('picamera2.encoders')
+_encoders.H264Encoder = H264Encoder
+sys.modules['picamera2.encoders'] = _encoders
+
+_outputs = types.ModuleType('picamera2.outputs')
+_outputs.FileOutput = FileOutput
+sys.modules['picamera2.outputs'] = _outputs
@@ -1,63 +1,168 @@
 
 
-import cv2
 import boto3
 import os
-import datetime
+import queue
+import subprocess
+import threading
+import time
 from pathlib import Path
 from upload import upload_to_s3
 
+CHUNK_DURATION = 60  # seconds per segment file
+SEGMENT_POLL_INTERVAL = 1  # seconds between checks for finished segments
+
 def save(url, s3_bucket_name):
     """
-    Saves RTSP stream to cloud location in one-minute chunks
+    Saves RTSP stream to cloud location in one-minute chunks.
+
+    The stream is passed through FFmpeg with `-c copy` so the camera's
+    H.264 bitstream is written straight to segmented MP4 files with no
+    decode/re-encode round trip in Python. Each finished segment is
+    uploaded to S3 and removed locally.
     """
     s3_client = boto3.client('s3')
     temp_dir = Path("/tmp/video_chunks")
     temp_dir.mkdir(exist_ok=True)
-    
-    cap = cv2.VideoCapture(url)
-    if not cap.isOpened():
-        raise Exception(f"Failed to open RTSP stream: {url}")
-    
-    fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    chunk_duration = 60
-    frames_per_chunk = fps * chunk_duration
-    
-    chunk_counter = 0
-    frame_counter = 0
-    current_writer = None
-    current_filename = None
-    
+
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-rtsp_transport", "tcp",
+        "-i", url,
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(CHUNK_DURATION),
+        "-reset_timestamps", "1",
+        "-strftime", "1",
+        str(temp_dir / "chunk_%Y%m%d_%H%M%S.mp4"),
+    ]
+    proc = subprocess.Popen(ffmpeg_cmd)
+
+    uploaded = set()
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_counter % frames_per_chunk == 0:
-                if current_writer:
-                    current_writer.release()
-                    upload_to_s3(current_filename, s3_client, s3_bucket_name)
-                    os.remove(current_filename)
-                
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                current_filename = temp_dir / f"chunk_{timestamp}_{chunk_counter:04d}.mp4"
-                current_writer = cv2.VideoWriter(str(current_filename), fourcc, fps, (width, height))
-                chunk_counter += 1
-            
-            current_writer.write(frame)
-            frame_counter += 1
-            
+        while proc.poll() is None:
+            for chunk in _finished_chunks(temp_dir, uploaded):
+                upload_to_s3(chunk, s3_client, s3_bucket_name)
+                os.remove(chunk)
+                uploaded.add(chunk)
+            time.sleep(SEGMENT_POLL_INTERVAL)
+        if proc.returncode != 0:
+            raise Exception(f"FFmpeg exited with code {proc.returncode} for stream: {url}")
     except KeyboardInterrupt:
         pass
     finally:
-        if current_writer:
-            current_writer.release()
-            if current_filename and os.path.exists(current_filename):
-                upload_to_s3(current_filename, s3_client, s3_bucket_name)
-                os.remove(current_filename)
-        cap.release()
+        if proc.poll() is None:
+            proc.terminate()
+            proc.wait()
+        # Upload whatever segments remain, including the last partial one
+        for chunk in sorted(temp_dir.glob("chunk_*.mp4")):
+            if chunk not in uploaded:
+                upload_to_s3(chunk, s3_client, s3_bucket_name)
+                os.remove(chunk)
+
+def save_gstreamer(url, s3_bucket_name):
+    """
+    Saves RTSP stream to cloud location in one-minute chunks via GStreamer.
+
+    Like save(), no pixel bytes ever enter Python: rtspsrc feeds the
+    depayloaded H.264 straight into splitmuxsink inside native GStreamer
+    threads. Python only reacts to fragment-closed bus messages, so each
+    finished chunk is uploaded as soon as the muxer closes it instead of
+    being discovered by polling the directory.
+    """
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst, GLib
+
+    Gst.init(None)
+    s3_client = boto3.client('s3')
+    temp_dir = Path("/tmp/video_chunks")
+    temp_dir.mkdir(exist_ok=True)
+
+    pipeline = Gst.parse_launch(
+        f"rtspsrc location={url} protocols=tcp ! rtph264depay ! h264parse "
+        f"! splitmuxsink muxer=mp4mux "
+        f"max-size-time={CHUNK_DURATION * Gst.SECOND} "
+        f"location={temp_dir}/chunk_%05d.mp4"
+    )
+
+    loop = GLib.MainLoop()
+
+    def on_message(bus, message):
+        struct = message.get_structure()
+        if struct is not None and struct.get_name() == "splitmuxsink-fragment-closed":
+            chunk = Path(struct.get_string("location"))
+            upload_to_s3(chunk, s3_client, s3_bucket_name)
+            os.remove(chunk)
+        elif message.type in (Gst.MessageType.EOS, Gst.MessageType.ERROR):
+            loop.quit()
+        return True
+
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", on_message)
+
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+class FrameGrabber:
+    """
+    Decouples RTSP decode from frame consumers (e.g. on-device ML).
+
+    A grabber thread reads frames into a small bounded queue so a slow
+    consumer back-pressures here instead of silently overflowing
+    OpenCV's RTSP input buffer. When the queue is full the frame is
+    dropped and counted, making the loss observable.
+    """
+
+    def __init__(self, url, maxsize=4):
+        import cv2
+        self._cap = cv2.VideoCapture(url)
+        if not self._cap.isOpened():
+            raise Exception(f"Failed to open RTSP stream: {url}")
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        while self._running:
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            try:
+                self.frames.put(frame, timeout=0.1)
+            except queue.Full:
+                self.dropped += 1
+                if self.dropped % 100 == 1:
+                    print(f"FrameGrabber: consumer too slow, {self.dropped} frames dropped")
+        self._running = False
+
+    def read(self, timeout=1):
+        """
+        Returns the next decoded frame, blocking up to timeout seconds
+        """
+        return self.frames.get(timeout=timeout)
+
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=1)
+        self._cap.release()
+
+def _finished_chunks(temp_dir, uploaded):
+    """
+    Yields segment files FFmpeg has finished writing, oldest first.
+
+    FFmpeg writes segments in order, so every file except the newest
+    one has been closed and is safe to upload.
+    """
+    chunks = sorted(temp_dir.glob("chunk_*.mp4"))
+    for chunk in chunks[:-1]:
+        if chunk not in uploaded:
+            yield chunk
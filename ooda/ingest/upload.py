@@ -1,13 +1,52 @@
-import os 
+import os
 
-def upload_to_s3(local_file, s3_client, bucket_name):
+from boto3.s3.transfer import TransferConfig
+
+# Shared transfer configuration: multipart + 10 concurrent threads per
+# upload so a single 60 s chunk can saturate the uplink instead of
+# trickling through one connection with default socket buffers. The
+# 256 KB io_chunksize matches the kernel readahead window and keeps
+# socket writes far above the 8 KB default.
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+    io_chunksize=256 * 1024,
+)
+
+def upload_to_s3(local_file, s3_client, bucket_name, config=TRANSFER_CONFIG):
     """
     Upload file to S3 bucket
+
+    Chunks below the multipart threshold go through a single put_object
+    call, skipping the CreateMultipartUpload/CompleteMultipartUpload
+    round-trips; larger ones use multipart transfer.
     """
     try:
         filename = os.path.basename(local_file)
         s3_key = f"video_chunks/{filename}"
-        s3_client.upload_file(str(local_file), bucket_name, s3_key)
+        size = os.path.getsize(local_file)
+        if size < config.multipart_threshold:
+            with open(local_file, 'rb') as f:
+                s3_client.put_object(
+                    Bucket=bucket_name,
+                    Key=s3_key,
+                    Body=f,
+                    ContentType='video/mp4'
+                )
+        else:
+            # Hand the transfer an open file object so parts stream
+            # straight from the page cache instead of being re-read
+            # through upload_file's own file management
+            with open(local_file, 'rb') as f:
+                s3_client.upload_fileobj(
+                    f,
+                    bucket_name,
+                    s3_key,
+                    ExtraArgs={'ContentType': 'video/mp4'},
+                    Config=config
+                )
         print(f"Uploaded {filename} to s3://{bucket_name}/{s3_key}")
     except Exception as e:
-        print(f"Failed to upload {filename}: {e}")
\ No newline at end of file
+        print(f"Failed to upload {filename}: {e}")
@@ -12,44 +12,9 @@ else
     source venv/bin/activate
 fi
 
-# Mock libcamera for local testing
-cat > picamera2_mock.py << EOF
-"""
-Mock picamera2 module for local testing
-"""
-class Picamera2:
-    def __init__(self):
-        print("Mock Picamera2 initialized")
-        
-    def configure(self, config):
-        print("Mock camera configured")
-        
-    def create_video_configuration(self):
-        return {}
-        
-    def start(self):
-        print("Mock camera started")
-        
-    def stop(self):
-        print("Mock camera stopped")
-        
-    def create_encoder(self):
-        encoder = MockEncoder()
-        return encoder
-
-class MockEncoder:
-    def __init__(self):
-        self.output = None
-        
-    def start(self):
-        print(f"Mock encoder started: {self.output}")
-        # Create a dummy file
-        with open(self.output, 'wb') as f:
-            f.write(b'dummy video content')
-            
-    def stop(self):
-        print("Mock encoder stopped")
-EOF
+# Local runs use the checked-in ooda/cameras/pi_zero_w/picamera2_mock.py,
+# which tracks the picamera2 API surface pi_camera.py uses (including the
+# encoders/outputs submodules); no mock is generated here.
 
 # Create a .env file for configuration
 cat > .env << EOF
@@ -76,7 +41,7 @@ import sys
 import time
 
 # Add mock picamera2 to path
-sys.path.insert(0, os.getcwd())
+sys.path.insert(0, 'ooda/cameras/pi_zero_w')
 import picamera2_mock
 sys.modules['picamera2'] = picamera2_mock
 
@@ -5,129 +5,133 @@ Unit tests for pi_camera.py module
 import os
 import sys
 import time
+import asyncio
 import unittest
 import tempfile
 import threading
-from unittest.mock import patch, MagicMock, ANY
+from unittest.mock import patch, MagicMock, AsyncMock
 from pathlib import Path
 
-import boto3
-import moto
+# Make pi_camera and its local-testing mock importable, and install the
+# mock before pi_camera is imported
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'ooda', 'cameras', 'pi_zero_w'))
+import picamera2_mock
+sys.modules['picamera2'] = picamera2_mock
 
-# Import the module to test
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from Desktop.git_repos.ooda_box.ooda.cameras.pi_zero_w.pi_camera import VideoCapture
+import pi_camera
+from pi_camera import VideoCapture
 
 class TestPiCamera(unittest.TestCase):
     """Test suite for the pi_camera module"""
-    
-    @patch('pi_camera.picamera2')
-    def setUp(self, mock_picamera2):
+
+    def setUp(self):
         """Set up test environment"""
         # Create a temp directory for video storage
         self.temp_dir = tempfile.TemporaryDirectory()
         self.storage_path = Path(self.temp_dir.name)
-        
-        # Mock the Picamera2 class
-        self.mock_camera = MagicMock()
-        self.mock_encoder = MagicMock()
-        mock_picamera2.Picamera2.return_value = self.mock_camera
-        self.mock_camera.create_encoder.return_value = self.mock_encoder
-        
-        # Prepare mocked S3 environment
-        self.s3_mock = moto.mock_s3()
-        self.s3_mock.start()
-        self.s3_client = boto3.client('s3')
-        self.bucket_name = 'test-bucket'
-        self.s3_client.create_bucket(Bucket=self.bucket_name)
-        
-        # Create test instance with mocked dependencies
+
+        # Create test instance backed by the picamera2 mock
         self.capture = VideoCapture(
             mode='capture-only',
             storage_path=self.storage_path,
-            s3_bucket=self.bucket_name,
+            s3_bucket='test-bucket',
             s3_prefix='test/'
         )
-        
-        # Replace real S3 client with our mocked version
-        self.capture.s3_client = self.s3_client
-        
+
     def tearDown(self):
         """Clean up after tests"""
         self.temp_dir.cleanup()
-        self.s3_mock.stop()
-    
+
     def test_init(self):
         """Test initialization"""
         self.assertEqual(self.capture.mode, 'capture-only')
         self.assertEqual(self.capture.storage_path, self.storage_path)
-        self.assertEqual(self.capture.s3_bucket, self.bucket_name)
+        self.assertEqual(self.capture.s3_bucket, 'test-bucket')
         self.assertEqual(self.capture.s3_prefix, 'test/')
         self.assertFalse(self.capture.running)
-    
-    @patch('pi_camera.time.sleep', return_value=None)  # Don't actually sleep in tests
-    def test_capture_video_flow(self, mock_sleep):
+        self.assertIsNotNone(self.capture._s3_session)
+
+    def test_filename_generator(self):
+        """Chunk names are unique, chronological and land in storage_path"""
+        gen = self.capture._filename_generator()
+        first, second = next(gen), next(gen)
+        self.assertNotEqual(first, second)
+        self.assertLess(str(first), str(second))
+        self.assertTrue(first.name.endswith(f'.{pi_camera.VIDEO_FORMAT}'))
+        self.assertEqual(first.parent, self.storage_path)
+
+    @patch('pi_camera.VIDEO_CHUNK_DURATION', 1)
+    def test_capture_video_flow(self):
         """Test the video capture flow"""
-        # Setup a simulated video file
-        test_file = self.storage_path / 'test_video.h264'
-        with open(test_file, 'wb') as f:
-            f.write(b'dummy video content')
-        
-        # Mock time.time to control the loop
-        original_time = time.time
-        time_sequence = [100, 100, 200]  # First stable, then jump forward
-        mock_time = MagicMock(side_effect=time_sequence)
-        
-        with patch('pi_camera.time.time', mock_time):
-            with patch.object(self.capture, 'video_queue') as mock_queue:
-                # Start capture in a separate thread as it's a loop
-                self.capture.running = True
-                thread = threading.Thread(target=self.capture._capture_video_loop)
-                thread.daemon = True
-                thread.start()
-                
-                # Let it run briefly
-                time.sleep(0.1)
-                
-                # Stop the capture
-                self.capture.running = False
-                thread.join(timeout=0.5)
-                
-                # Verify camera operations
-                self.mock_camera.configure.assert_called()
-                self.mock_camera.start.assert_called()
-                
-    @patch('pi_camera.time.sleep', return_value=None)
-    @patch('pi_camera.os.remove')
-    def test_s3_upload_flow(self, mock_remove, mock_sleep):
-        """Test the S3 upload flow"""
-        # Create test files
-        test_files = []
-        for i in range(3):
-            filepath = self.storage_path / f'test_video_{i}.h264'
-            with open(filepath, 'wb') as f:
-                f.write(f'test content {i}'.encode())
-            test_files.append(filepath)
-        
-        # Setup time mock to trigger upload
-        with patch('pi_camera.time.time', side_effect=[100, 500]):  # Large time gap to trigger upload
-            self.capture.running = True
-            
-            # Add files to queue
-            for filepath in test_files:
-                self.capture.video_queue.put(filepath)
-            
-            # Run the upload loop once
-            self.capture._s3_upload_loop()
-            
-            # Verify upload operations
-            s3_objects = self.s3_client.list_objects(Bucket=self.bucket_name)
-            self.assertIn('Contents', s3_objects)
-            self.assertEqual(len(s3_objects['Contents']), 3)
-            
-            # Verify files were deleted after upload
-            self.assertEqual(mock_remove.call_count, 3)
-    
+        self.capture.running = True
+        thread = threading.Thread(target=self.capture._capture_video_loop)
+        thread.daemon = True
+        thread.start()
+
+        # Let at least one 1 s chunk complete
+        time.sleep(1.3)
+        self.capture.running = False
+        thread.join(timeout=3)
+
+        chunks = list(self.storage_path.glob(f'video_*.{pi_camera.VIDEO_FORMAT}'))
+        self.assertTrue(chunks)
+        self.assertEqual(chunks[0].read_bytes(), b'dummy video content')
+
+    def test_upload_file(self):
+        """A chunk uploads under the right key and is removed locally"""
+        filepath = self.storage_path / 'video_1_0000.h264'
+        filepath.write_bytes(b'test content')
+        s3 = MagicMock()
+        s3.upload_file = AsyncMock()
+
+        async def run():
+            sem = asyncio.Semaphore(1)
+            await self.capture._upload_file(s3, sem, {filepath.name}, filepath)
+
+        asyncio.run(run())
+        s3.upload_file.assert_awaited_once()
+        args = s3.upload_file.await_args.args
+        self.assertEqual(args[0], str(filepath))
+        self.assertEqual(args[1], 'test-bucket')
+        self.assertEqual(args[2], f'test/{filepath.name}')
+        self.assertFalse(filepath.exists())
+
+    def test_upload_file_skips_missing(self):
+        """Files absent from the batch directory listing are skipped"""
+        filepath = self.storage_path / 'video_2_0001.h264'
+        s3 = MagicMock()
+        s3.upload_file = AsyncMock()
+
+        async def run():
+            await self.capture._upload_file(s3, asyncio.Semaphore(1), set(), filepath)
+
+        asyncio.run(run())
+        s3.upload_file.assert_not_awaited()
+
+    def test_drain_video_queue(self):
+        """Drain empties the queue in one pass and filters sentinels"""
+        async def run():
+            self.capture.video_queue = asyncio.Queue(maxsize=5)
+            for item in (Path('a'), None, Path('b')):
+                self.capture.video_queue.put_nowait(item)
+            batch = self.capture._drain_video_queue()
+            self.assertEqual(batch, [Path('a'), Path('b')])
+            self.assertTrue(self.capture.video_queue.empty())
+
+        asyncio.run(run())
+
+    def test_enqueue_skipped_after_shutdown(self):
+        """A chunk finishing after stop_capture stays on disk quietly"""
+        loop = asyncio.new_event_loop()
+        loop.close()
+        self.capture._upload_loop = loop
+        self.capture.video_queue = None  # would blow up if touched
+        self.capture.running = False
+
+        # Must not raise into the capture loop's recovery path
+        self.capture._enqueue_chunk(self.storage_path / 'video_3_0002.h264')
+
     @patch('pi_camera.threading.Thread')
     def test_start_capture(self, mock_thread):
         """Test the start_capture method"""
@@ -135,27 +139,29 @@ class TestPiCamera(unittest.TestCase):
         mock_capture_thread = MagicMock()
         mock_upload_thread = MagicMock()
         mock_thread.side_effect = [mock_capture_thread, mock_upload_thread]
-        
-        # Stop after a brief moment
-        def set_running_false(*args):
-            time.sleep(0.1)
-            self.capture.running = False
-            
-        with patch('pi_camera.time.sleep', side_effect=set_running_false):
-            self.capture.start_capture()
-            
-            # Verify threads started
-            self.assertEqual(mock_thread.call_count, 2)
-            mock_capture_thread.start.assert_called_once()
-            mock_upload_thread.start.assert_called_once()
-            self.assertFalse(self.capture.running)
-            
+
+        # Pre-set the stop event so the keepalive wait returns at once
+        self.capture._stop.set()
+        self.capture.start_capture()
+
+        # Verify threads started
+        self.assertEqual(mock_thread.call_count, 2)
+        mock_capture_thread.start.assert_called_once()
+        mock_upload_thread.start.assert_called_once()
+
+    def test_stop_capture(self):
+        """Test the stop_capture method"""
+        self.capture.running = True
+        self.capture.stop_capture()
+        self.assertFalse(self.capture.running)
+        self.assertTrue(self.capture._stop.is_set())
+
     def test_invalid_mode(self):
         """Test invalid mode handling"""
         with patch('pi_camera.logger') as mock_logger:
-            capture = VideoCapture(mode='invalid-mode')
+            capture = VideoCapture(mode='invalid-mode', storage_path=self.storage_path)
             capture.start_capture()
-            mock_logger.error.assert_called_with("Unsupported mode: invalid-mode")
+            mock_logger.error.assert_called_with("Unsupported mode: %s", 'invalid-mode')
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()